@@ -0,0 +1,434 @@
+import time
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from ecdsa import SECP256k1, SigningKey
+
+# Experimental lockstep secp256k1 backend. Field elements are (LIMBS, N) uint64 arrays of
+# 16-bit limbs (least significant limb first) so every limb operation runs over the batch axis.
+# Limbs are kept in a loose, non-canonical form (each limb < 2**17, value congruent mod p) and
+# only fully carried when bytes or a zero test are needed.
+FIELD_P = SECP256k1.curve.p()
+CURVE_ORDER = SECP256k1.order
+GENERATOR_X = SECP256k1.generator.x()
+GENERATOR_Y = SECP256k1.generator.y()
+
+LIMBS = 16
+LIMB_BITS = 16
+LIMB_MASK = np.uint64((1 << LIMB_BITS) - 1)
+SHIFT = np.uint64(LIMB_BITS)
+FOLD_LOW = np.uint64(977)  # 2**256 == 2**32 + 977 (mod p); the 2**32 term is a two-limb shift
+WINDOW_BITS = 8  # one comb window per scalar byte
+WINDOWS = 256 // WINDOW_BITS
+DEFAULT_BATCH_SIZE = 2048
+
+
+def _int_to_limbs(value: int) -> np.ndarray:
+    return np.array([(value >> (LIMB_BITS * i)) & 0xFFFF for i in range(LIMBS)], dtype=np.uint64)
+
+
+def _p_multiple_bias() -> np.ndarray:
+    digits = [((8 * FIELD_P) >> (LIMB_BITS * i)) & 0xFFFF for i in range(LIMBS - 1)]
+    digits.append((8 * FIELD_P) >> (LIMB_BITS * (LIMBS - 1)))
+    borrow = 1 << 19
+    bias = [digits[0] + borrow]
+    bias.extend(d + borrow - (borrow >> LIMB_BITS) for d in digits[1:-1])
+    bias.append(digits[-1] - (borrow >> LIMB_BITS))
+    return np.array(bias, dtype=np.uint64)[:, None]
+
+
+P_LIMBS = _int_to_limbs(FIELD_P)[:, None]
+# 8p with every limb >= 2**18; adding it first keeps a loose subtraction from underflowing a limb
+P_BIAS = _p_multiple_bias()
+# A loose element is < 4p, and the limb sum is its residue mod 2**16 - 1, so these are the only
+# residues a zero element can have; it makes the exact zero test rare.
+ZERO_RESIDUES = np.array(sorted({(k * FIELD_P) % 0xFFFF for k in range(4)}), dtype=np.uint64)
+
+
+def _carry(x: np.ndarray, passes: int) -> np.ndarray:
+    for _ in range(passes):
+        carry = x[:-1] >> SHIFT
+        x[:-1] &= LIMB_MASK
+        x[1:] += carry
+    return x
+
+
+def _fold_top(x: np.ndarray) -> np.ndarray:
+    excess = x[-1] >> SHIFT
+    x[-1] &= LIMB_MASK
+    x[0] += excess * FOLD_LOW
+    x[2] += excess
+    return _carry(x, 2)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return _fold_top(_carry(x, 2))
+
+
+def fe_add(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return _normalize(a + b)
+
+
+def fe_sub(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return _normalize(a + P_BIAS - b)
+
+
+def fe_mul_small(a: np.ndarray, factor: int) -> np.ndarray:
+    return _normalize(a * np.uint64(factor))
+
+
+def fe_mul(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    count = a.shape[1]
+    wide = np.empty((2 * LIMBS, count), dtype=np.uint64)
+    np.multiply(a[0], b, out=wide[:LIMBS])
+    wide[LIMBS:] = 0
+    partial = np.empty((LIMBS, count), dtype=np.uint64)
+    for i in range(1, LIMBS):
+        np.multiply(a[i], b, out=partial)
+        wide[i:i + LIMBS] += partial
+    _carry(wide, 2)
+
+    # First fold: 32 limbs -> 18 limbs
+    folded = np.zeros((LIMBS + 2, count), dtype=np.uint64)
+    high = wide[LIMBS:]
+    folded[:LIMBS] = wide[:LIMBS] + high * FOLD_LOW
+    folded[2:] += high
+    _carry(folded, 3)
+
+    # Second fold: 18 limbs -> 16 limbs
+    result = folded[:LIMBS]
+    high = folded[LIMBS:]
+    result[:2] += high * FOLD_LOW
+    result[2:4] += high
+    return _carry(result, 3)
+
+
+def fe_sqr(a: np.ndarray) -> np.ndarray:
+    return fe_mul(a, a)
+
+
+def _sqr_n(a: np.ndarray, times: int) -> np.ndarray:
+    for _ in range(times):
+        a = fe_sqr(a)
+    return a
+
+
+def fe_inv(a: np.ndarray) -> np.ndarray:
+    # a**(p-2) via the secp256k1 addition chain (255 squarings, 15 multiplications)
+    x2 = fe_mul(fe_sqr(a), a)
+    x3 = fe_mul(fe_sqr(x2), a)
+    x6 = fe_mul(_sqr_n(x3, 3), x3)
+    x9 = fe_mul(_sqr_n(x6, 3), x3)
+    x11 = fe_mul(_sqr_n(x9, 2), x2)
+    x22 = fe_mul(_sqr_n(x11, 11), x11)
+    x44 = fe_mul(_sqr_n(x22, 22), x22)
+    x88 = fe_mul(_sqr_n(x44, 44), x44)
+    x176 = fe_mul(_sqr_n(x88, 88), x88)
+    x220 = fe_mul(_sqr_n(x176, 44), x44)
+    x223 = fe_mul(_sqr_n(x220, 3), x3)
+    t = fe_mul(_sqr_n(x223, 23), x22)
+    t = fe_mul(_sqr_n(t, 5), a)
+    t = fe_mul(_sqr_n(t, 3), x2)
+    return fe_mul(_sqr_n(t, 2), a)
+
+
+def fe_batch_inv(a: np.ndarray) -> np.ndarray:
+    # Product tree over the batch axis, so every (nonzero) lane shares a single fe_inv
+    levels = []
+    current = a
+    while current.shape[1] > 1:
+        if current.shape[1] % 2:
+            one = np.zeros((LIMBS, 1), dtype=np.uint64)
+            one[0] = 1
+            current = np.hstack([current, one])
+        levels.append(current)
+        current = fe_mul(current[:, 0::2], current[:, 1::2])
+
+    inverse = fe_inv(current)
+    for level in reversed(levels):
+        inverse = inverse[:, :level.shape[1] // 2]
+        expanded = np.empty_like(level)
+        expanded[:, 0::2] = fe_mul(inverse, level[:, 1::2])
+        expanded[:, 1::2] = fe_mul(inverse, level[:, 0::2])
+        inverse = expanded
+    return inverse[:, :a.shape[1]]
+
+
+def fe_canonical(a: np.ndarray) -> np.ndarray:
+    x = a.copy()
+    for fold in range(3):
+        for i in range(LIMBS - 1):
+            x[i + 1] += x[i] >> SHIFT
+            x[i] &= LIMB_MASK
+        if fold == 2:
+            break
+        excess = x[-1] >> SHIFT
+        x[-1] &= LIMB_MASK
+        x[0] += excess * FOLD_LOW
+        x[2] += excess
+
+    # Value is now below 2**256 < 2p: subtract p once where it does not borrow
+    diff = x.astype(np.int64) - P_LIMBS.astype(np.int64)
+    for i in range(LIMBS - 1):
+        borrow = diff[i] < 0
+        diff[i] += borrow * (1 << LIMB_BITS)
+        diff[i + 1] -= borrow
+    keep = diff[-1] < 0
+    return np.where(keep, x, diff.astype(np.uint64))
+
+
+def fe_is_zero(a: np.ndarray) -> np.ndarray:
+    zero = np.zeros(a.shape[1], dtype=bool)
+    residue = a.sum(axis=0) % np.uint64(0xFFFF)
+    suspects = np.flatnonzero(np.isin(residue, ZERO_RESIDUES))
+    if suspects.size:
+        zero[suspects] = ~np.any(fe_canonical(a[:, suspects]), axis=0)
+    return zero
+
+
+def _affine_add(p1: Tuple[int, int] | None, p2: Tuple[int, int] | None) -> Tuple[int, int] | None:
+    if p1 is None:
+        return p2
+    if p2 is None:
+        return p1
+    (x1, y1), (x2, y2) = p1, p2
+    if x1 == x2:
+        if (y1 + y2) % FIELD_P == 0:
+            return None
+        slope = 3 * x1 * x1 * pow(2 * y1, -1, FIELD_P)
+    else:
+        slope = (y2 - y1) * pow(x2 - x1, -1, FIELD_P)
+    slope %= FIELD_P
+    x3 = (slope * slope - x1 - x2) % FIELD_P
+    return x3, (slope * (x1 - x3) - y1) % FIELD_P
+
+
+@lru_cache(maxsize=1)
+def generator_table() -> Tuple[np.ndarray, np.ndarray]:
+    # Affine d * 256**w * G for window w and digit d
+    table_x = np.zeros((WINDOWS, LIMBS, 1 << WINDOW_BITS), dtype=np.uint64)
+    table_y = np.zeros_like(table_x)
+    base = (GENERATOR_X, GENERATOR_Y)
+    for window in range(WINDOWS):
+        point = None
+        for digit in range(1, 1 << WINDOW_BITS):
+            point = _affine_add(point, base)
+            table_x[window, :, digit] = _int_to_limbs(point[0])
+            table_y[window, :, digit] = _int_to_limbs(point[1])
+        base = _affine_add(point, base)
+    return table_x, table_y
+
+
+def _jacobian_double(x: np.ndarray, y: np.ndarray, z: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # dbl-2009-l for a = 0
+    a = fe_sqr(x)
+    b = fe_sqr(y)
+    c = fe_sqr(b)
+    d = fe_mul_small(fe_sub(fe_sub(fe_sqr(fe_add(x, b)), a), c), 2)
+    e = fe_mul_small(a, 3)
+    f = fe_sqr(e)
+    x3 = fe_sub(f, fe_mul_small(d, 2))
+    y3 = fe_sub(fe_mul(e, fe_sub(d, x3)), fe_mul_small(c, 8))
+    z3 = fe_mul_small(fe_mul(y, z), 2)
+    return x3, y3, z3
+
+
+def _jacobian_add_affine(
+    x1: np.ndarray, y1: np.ndarray, z1: np.ndarray, x2: np.ndarray, y2: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # madd-2004-hmv; H == 0 means equal x: a doubling when R == 0 too, else the point at infinity
+    z1z1 = fe_sqr(z1)
+    u2 = fe_mul(x2, z1z1)
+    s2 = fe_mul(y2, fe_mul(z1, z1z1))
+    h = fe_sub(u2, x1)
+    r = fe_sub(s2, y1)
+    hh = fe_sqr(h)
+    hhh = fe_mul(h, hh)
+    v = fe_mul(x1, hh)
+    x3 = fe_sub(fe_sub(fe_sqr(r), hhh), fe_mul_small(v, 2))
+    y3 = fe_sub(fe_mul(r, fe_sub(v, x3)), fe_mul(y1, hhh))
+    z3 = fe_mul(z1, h)
+    return x3, y3, z3, fe_is_zero(h), fe_is_zero(r)
+
+
+def scalar_digits(scalars: np.ndarray) -> np.ndarray:
+    return scalars[:, ::-1].T.astype(np.intp)
+
+
+def limbs_to_bytes(a: np.ndarray) -> np.ndarray:
+    out = np.empty((a.shape[1], 32), dtype=np.uint8)
+    for i in range(LIMBS):
+        out[:, 31 - 2 * i] = a[i] & np.uint64(0xFF)
+        out[:, 30 - 2 * i] = a[i] >> np.uint64(8)
+    return out
+
+
+def _public_points_chunk(scalars: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    table_x, table_y = generator_table()
+    count = scalars.shape[0]
+    digits = scalar_digits(scalars)
+
+    x = np.zeros((LIMBS, count), dtype=np.uint64)
+    y = np.zeros_like(x)
+    z = np.zeros_like(x)
+    z_one = np.zeros_like(x)
+    z_one[0] = 1
+    infinity = np.ones(count, dtype=bool)
+
+    for window in range(WINDOWS):
+        digit = digits[window]
+        nonzero = digit != 0
+        if not nonzero.any():
+            continue
+        x2 = table_x[window][:, digit]
+        y2 = table_y[window][:, digit]
+
+        x3, y3, z3, h_zero, r_zero = _jacobian_add_affine(x, y, z, x2, y2)
+        adding = nonzero & ~infinity
+        doubling = adding & h_zero & r_zero
+        cancelling = adding & h_zero & ~r_zero
+        if doubling.any():
+            dx, dy, dz = _jacobian_double(x, y, z)
+            x3 = np.where(doubling, dx, x3)
+            y3 = np.where(doubling, dy, y3)
+            z3 = np.where(doubling, dz, z3)
+
+        starting = nonzero & infinity
+        x = np.where(starting, x2, np.where(adding, x3, x))
+        y = np.where(starting, y2, np.where(adding, y3, y))
+        z = np.where(starting, z_one, np.where(adding, z3, z))
+        infinity = (infinity & ~starting) | cancelling
+
+    # Lanes still at infinity (k == 0) get Z = 1 so the shared batch inversion stays defined
+    z_inv = fe_batch_inv(np.where(infinity, z_one, z))
+    z_inv2 = fe_sqr(z_inv)
+    affine_x = fe_canonical(fe_mul(x, z_inv2))
+    affine_y = fe_canonical(fe_mul(y, fe_mul(z_inv2, z_inv)))
+    return limbs_to_bytes(affine_x), limbs_to_bytes(affine_y)
+
+
+def valid_scalar_mask(scalars: np.ndarray) -> np.ndarray:
+    return np.array([0 < int.from_bytes(row.tobytes(), "big") < CURVE_ORDER for row in scalars], dtype=bool)
+
+
+def public_points_batch(
+    scalars: np.ndarray, batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    scalars = np.asarray(scalars, dtype=np.uint8)
+    if scalars.ndim != 2 or scalars.shape[1] != 32:
+        raise ValueError(f"Expected a (N, 32) scalar matrix, got shape {scalars.shape}")
+
+    xs = np.zeros((scalars.shape[0], 32), dtype=np.uint8)
+    ys = np.zeros_like(xs)
+    for start in range(0, scalars.shape[0], batch_size):
+        chunk = scalars[start:start + batch_size]
+        xs[start:start + batch_size], ys[start:start + batch_size] = _public_points_chunk(chunk)
+    return xs, ys, valid_scalar_mask(scalars)
+
+
+def serialize_pubkeys(xs: np.ndarray, ys: np.ndarray, compressed: bool) -> np.ndarray:
+    if compressed:
+        prefix = (0x02 + (ys[:, -1] & 1)).astype(np.uint8)[:, None]
+        return np.hstack([prefix, xs])
+    prefix = np.full((xs.shape[0], 1), 0x04, dtype=np.uint8)
+    return np.hstack([prefix, xs, ys])
+
+
+def keys_to_matrix(priv_keys: Sequence[bytes]) -> np.ndarray:
+    if not priv_keys:
+        return np.zeros((0, 32), dtype=np.uint8)
+    return np.frombuffer(b"".join(priv_keys), dtype=np.uint8).reshape(len(priv_keys), 32)
+
+
+def check_against_ecdsa(priv_keys: Sequence[bytes], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    xs, ys, valid = public_points_batch(keys_to_matrix(priv_keys), batch_size=batch_size)
+    for i, priv_bytes in enumerate(priv_keys):
+        expected_valid = 0 < int.from_bytes(priv_bytes, "big") < CURVE_ORDER
+        if bool(valid[i]) != expected_valid:
+            raise AssertionError(f"Validity mismatch for {priv_bytes.hex()}")
+        if not expected_valid:
+            continue
+        expected = SigningKey.from_string(priv_bytes, curve=SECP256k1).verifying_key.to_string()
+        if xs[i].tobytes() + ys[i].tobytes() != expected:
+            raise AssertionError(f"Public key mismatch for {priv_bytes.hex()}")
+    return int(valid.sum())
+
+
+def edge_case_keys() -> List[bytes]:
+    scalars = [1, 2, 3, 15, 16, 17, 255, 256, 2**128, 2**255, 256**31, 255 * 256**31, CURVE_ORDER - 1, CURVE_ORDER - 2]
+    scalars += [0, CURVE_ORDER, 2**256 - 1]
+    return [value.to_bytes(32, "big") for value in scalars]
+
+
+def transform_candidate_keys(image_path: str, pairings: Sequence[str] | None = None) -> List[bytes]:
+    from solve_level5 import (
+        DEFAULT_POST_TICK_MODES,
+        DEFAULT_PRE_TICK_MODES,
+        apply_pair_tick_adjustments,
+        apply_tick_adjustments,
+        combine_pairs,
+        contains_byte77,
+        get_default_area_sources,
+        pairing_orders,
+        transform_bytes,
+    )
+
+    _, area_sources = get_default_area_sources(image_path)
+    pairings_all = pairing_orders()
+    selected = pairings if pairings is not None else list(pairings_all.keys())
+
+    keys: Dict[bytes, None] = {}
+    for values in area_sources.values():
+        for pre_mode in DEFAULT_PRE_TICK_MODES:
+            adjusted = apply_tick_adjustments(values, pre_mode)
+            for pair_name in selected:
+                pairs = pairings_all[pair_name]
+                pair_sums = combine_pairs(adjusted, pairs)
+                for post_mode in DEFAULT_POST_TICK_MODES:
+                    post_pair_sums = apply_pair_tick_adjustments(pair_sums, pairs, post_mode)
+                    for _, byte_values in transform_bytes(post_pair_sums):
+                        if len(byte_values) == 32 and contains_byte77(byte_values):
+                            keys.setdefault(bytes(byte_values), None)
+    return list(keys)
+
+
+def main() -> None:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Self-check and benchmark for the NumPy secp256k1 backend")
+    parser.add_argument("--image", default="crypto5fix.png", help="Path to puzzle image for transform candidates")
+    parser.add_argument("--pairs", default="row_major", help="Comma-separated pairing names to draw candidates from")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Scalars per lockstep batch")
+    parser.add_argument("--bench-keys", type=int, default=8192, help="Random keys for the throughput comparison")
+    args = parser.parse_args()
+
+    results: Dict[str, object] = {}
+    results["edge_cases_checked"] = check_against_ecdsa(edge_case_keys(), batch_size=args.batch_size)
+
+    pairings = [item.strip() for item in args.pairs.split(",") if item.strip()]
+    candidates = transform_candidate_keys(args.image, pairings)
+    results["transform_candidates_checked"] = check_against_ecdsa(candidates, batch_size=args.batch_size)
+
+    rng = np.random.default_rng(0)
+    bench = rng.integers(0, 256, size=(args.bench_keys, 32), dtype=np.uint8)
+    bench[:, 0] &= 0x7F  # stay below the curve order
+
+    started = time.perf_counter()
+    public_points_batch(bench, batch_size=args.batch_size)
+    batch_seconds = time.perf_counter() - started
+
+    reference_rows = bench[: min(len(bench), 1024)]
+    started = time.perf_counter()
+    for row in reference_rows:
+        SigningKey.from_string(row.tobytes(), curve=SECP256k1).verifying_key.to_string()
+    reference_seconds = time.perf_counter() - started
+
+    results["numpy_keys_per_sec"] = round(len(bench) / batch_seconds, 1)
+    results["ecdsa_keys_per_sec"] = round(len(reference_rows) / reference_seconds, 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
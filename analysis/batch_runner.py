@@ -1,5 +1,9 @@
 import argparse
 import json
+import itertools
+import os
+import time
+from dataclasses import replace
 from pathlib import Path
 from typing import Dict, List, Sequence, Tuple
 
@@ -15,8 +19,24 @@ from solve_level5 import (
     combine_pairs,
     transform_bytes,
     contains_byte77,
-    privkey_to_address,
+    address_to_hash160,
+    hash160_to_address,
 )
+from neighborhood import NEIGHBORHOOD_SPACES, NeighborhoodSearch
+from planner import balanced_shards, calibrate_backend, estimate_wall_times, transform_family
+from verifiers import AUTO_ORDER, BACKENDS, REFERENCE_BACKEND, VerifierBackend, cross_check, get_backend
+
+DEFAULT_CROSS_CHECK = 16
+# Roughly 3x the ~670k distinct keys of a full run without the neighborhood search
+DEFAULT_DEDUPE_LIMIT = 2_000_000
+DEDUPE_EVICT_DIVISOR = 10
+
+
+def forget_oldest(seen: Dict[str, None], count: int) -> None:
+    # Forgetting a key only costs a repeated verification, never a candidate. Evicting a batch in one
+    # pass avoids rescanning the deleted front entries of the dict on every insert.
+    for key in list(itertools.islice(seen, max(1, count))):
+        del seen[key]
 
 
 def parse_list_argument(value: str | None) -> List[str] | None:
@@ -48,6 +68,196 @@ def maybe_append_jsonl(path: Path | None, entry: Dict) -> None:
         fh.write(json.dumps(entry) + "\n")
 
 
+def combination_candidates(
+    area_sources: Dict,
+    pairings_all: Dict,
+    combination: Tuple[str, str, str, str],
+    transform_limit: int | None,
+    neighborhood: NeighborhoodSearch | None = None,
+) -> Tuple[int, List[Tuple[str, bytes, str]]]:
+    area_name, pre_mode, pairing_name, post_mode = combination
+    pairs = pairings_all[pairing_name]
+
+    adjusted_values = apply_tick_adjustments(area_sources[area_name], pre_mode)
+    if neighborhood is not None:
+        return neighborhood.candidates(adjusted_values, pairs, post_mode, (area_name, pairing_name))
+
+    pair_sums = combine_pairs(adjusted_values, pairs)
+    post_pair_sums = apply_pair_tick_adjustments(pair_sums, pairs, post_mode)
+
+    transforms_processed = 0
+    candidates: List[Tuple[str, bytes, str]] = []
+    for transform_name, byte_values in transform_bytes(post_pair_sums):
+        transforms_processed += 1
+        if transform_limit and transforms_processed > transform_limit:
+            break
+        if len(byte_values) != 32 or not contains_byte77(byte_values):
+            continue
+        candidates.append((transform_name, bytes(byte_values), ""))
+    return transforms_processed, candidates
+
+
+def plan_search(
+    combos_slice: Sequence[Tuple[str, str, str, str]],
+    start: int,
+    area_sources: Dict,
+    pairings_all: Dict,
+    transform_limit: int | None,
+    neighborhood: NeighborhoodSearch | None,
+    dedupe: bool,
+    backend: VerifierBackend,
+    calibration_keys: int,
+    verify_batch: int,
+    cross_check_sample: int,
+    worker_counts: Sequence[int],
+    shard_count: int,
+    check_shard: bool,
+) -> Dict:
+    # A shard runs on its own, so cost every combination without vectors pruned by earlier ones
+    plan_neighborhood = replace(neighborhood, dedupe=False) if neighborhood is not None else None
+    started = time.perf_counter()
+    global_seen: set[bytes] = set()
+    combo_keys: List[Tuple[int, List[bytes]]] = []
+    breakdowns: Dict[str, Dict[str, int]] = {"area": {}, "pairing": {}, "transform_family": {}}
+    total_transforms = 0
+    total_candidates = 0
+
+    for offset, combination in enumerate(combos_slice, start=start):
+        area_name, _, pairing_name, _ = combination
+        transforms_processed, candidates = combination_candidates(
+            area_sources, pairings_all, combination, transform_limit, plan_neighborhood
+        )
+        total_transforms += transforms_processed
+
+        local_seen: set[bytes] = set()
+        for transform_name, priv_bytes, _ in candidates:
+            if priv_bytes in local_seen:
+                continue
+            local_seen.add(priv_bytes)
+            if dedupe and priv_bytes in global_seen:
+                continue
+            global_seen.add(priv_bytes)
+            total_candidates += 1
+            # Keys are attributed to the first combination and transform that produce them
+            for field, name in (
+                ("area", area_name),
+                ("pairing", pairing_name),
+                ("transform_family", transform_family(transform_name)),
+            ):
+                breakdowns[field][name] = breakdowns[field].get(name, 0) + 1
+        # Shards deduplicate only within themselves, so keep each combination's own distinct keys
+        combo_keys.append((offset, list(local_seen)))
+
+    enumeration_seconds = time.perf_counter() - started
+    # Cycle small key sets so the timed call is as large as a real verifier batch
+    calibration = calibrate_backend(
+        backend,
+        list(itertools.islice(itertools.cycle(global_seen), calibration_keys)) if global_seen else [],
+        verify_batch,
+        cross_check_sample,
+    )
+
+    plan = {
+        "combinations_processed": len(combos_slice),
+        "start_index": start,
+        "end_index": start + len(combos_slice),
+        "total_transforms": total_transforms,
+        "total_candidates": total_candidates,
+        "enumeration_seconds": round(enumeration_seconds, 2),
+        "unique_by_area": dict(sorted(breakdowns["area"].items(), key=lambda item: -item[1])),
+        "unique_by_pairing": dict(sorted(breakdowns["pairing"].items(), key=lambda item: -item[1])),
+        "unique_by_transform_family": dict(
+            sorted(breakdowns["transform_family"].items(), key=lambda item: -item[1])
+        ),
+        "calibration": calibration,
+        "estimates": estimate_wall_times(
+            {
+                workers: max(shard["unique_keys"] for shard in balanced_shards(combo_keys, workers, dedupe))
+                for workers in worker_counts
+            },
+            calibration["keys_per_sec"],
+            enumeration_seconds,
+        ),
+        "shards": balanced_shards(combo_keys, shard_count, dedupe),
+    }
+    if plan_neighborhood is not None:
+        plan["neighborhood"] = {
+            "perturbations_per_combination": plan_neighborhood.size(),
+            "perturbations": plan_neighborhood.perturbations,
+            # Summed per combination; a run also skips vectors an earlier combination expanded
+            "combination_vectors": plan_neighborhood.distinct_vectors,
+        }
+    if check_shard and plan["shards"]:
+        shard = max(plan["shards"], key=lambda item: item["unique_keys"])
+        plan["shard_check"] = {
+            **shard,
+            "run_keys": run_key_count(
+                combos_slice[shard["start_index"] - start:shard["end_index"] - start],
+                area_sources,
+                pairings_all,
+                transform_limit,
+                replace(neighborhood, seen_vectors={}) if neighborhood is not None else None,
+                dedupe,
+            ),
+        }
+    return plan
+
+
+def run_key_count(
+    combos_slice: Sequence[Tuple[str, str, str, str]],
+    area_sources: Dict,
+    pairings_all: Dict,
+    transform_limit: int | None,
+    neighborhood: NeighborhoodSearch | None,
+    dedupe: bool,
+) -> int:
+    # Keys a run over combos_slice would verify, enumerated the way main does
+    global_seen: set[bytes] = set()
+    total = 0
+    for combination in combos_slice:
+        _, candidates = combination_candidates(area_sources, pairings_all, combination, transform_limit, neighborhood)
+        local_seen: set[bytes] = set()
+        for _, priv_bytes, _ in candidates:
+            if dedupe:
+                if priv_bytes in global_seen:
+                    continue
+                global_seen.add(priv_bytes)
+            if priv_bytes in local_seen:
+                continue
+            local_seen.add(priv_bytes)
+            total += 1
+    return total
+
+
+def verify_pending(
+    backend: VerifierBackend,
+    pending_keys: List[bytes],
+    pending_sources: List[Dict],
+    cross_check_sample: int,
+) -> Tuple[List[Dict], int]:
+    results = backend.hash160s(pending_keys)
+    mismatches = cross_check(backend, pending_keys, results, cross_check_sample)
+    if mismatches:
+        raise RuntimeError(f"Backend {backend.name} disagrees with the reference for keys: {mismatches}")
+
+    target_hash = address_to_hash160(TARGET_ADDRESS)
+    matches: List[Dict] = []
+    invalid = 0
+    for priv_bytes, source, hashes in zip(pending_keys, pending_sources, results):
+        if hashes is None:
+            invalid += 1
+            continue
+        for fmt, digest in zip(("compressed", "uncompressed"), hashes):
+            if digest == target_hash:
+                matches.append({
+                    **source,
+                    "format": fmt,
+                    "hex_key": priv_bytes.hex(),
+                    "address": hash160_to_address(digest),
+                })
+    return matches, invalid
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Batch explorer for Zden Level 5 combinations")
     parser.add_argument("--image", default="crypto5fix.png", help="Path to puzzle image")
@@ -61,8 +271,101 @@ def main() -> None:
     parser.add_argument("--output", help="JSONL file to append per-combination summaries")
     parser.add_argument("--matches-output", help="JSONL file to append any matches found")
     parser.add_argument("--no-dedupe", action="store_true", help="Disable global deduplication of candidate keys")
+    parser.add_argument(
+        "--dedupe-limit",
+        type=int,
+        default=DEFAULT_DEDUPE_LIMIT,
+        help="Keys held for global deduplication (~250 bytes each); past it the oldest tenth is forgotten",
+    )
+    parser.add_argument(
+        "--backend",
+        default="auto",
+        help=f"Verifier backend: auto ({' > '.join(AUTO_ORDER)}) or one of {', '.join(BACKENDS)}",
+    )
+    parser.add_argument("--verify-batch", type=int, default=4096, help="Candidate keys per verifier call")
+    parser.add_argument(
+        "--cross-check",
+        type=int,
+        help=(
+            "Keys per verifier call recomputed with the ecdsa reference; aborts on any mismatch "
+            f"(default: {DEFAULT_CROSS_CHECK} unless the backend is ecdsa)"
+        ),
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help=(
+            "Only enumerate and deduplicate candidates, then report counts, runtime estimates and shards; "
+            "counts are exact, so every key stays in memory (--dedupe-limit does not apply)"
+        ),
+    )
+    parser.add_argument("--plan-shards", type=int, default=4, help="Number of balanced shards to suggest")
+    parser.add_argument(
+        "--plan-check",
+        action="store_true",
+        help="Re-enumerate the largest suggested shard on its own, as a run would, and report its key count",
+    )
+    parser.add_argument(
+        "--plan-workers",
+        help="Comma-separated worker counts to estimate (default: 1,2,4,8 and the CPU count)",
+    )
+    parser.add_argument(
+        "--plan-calibration",
+        type=int,
+        default=2048,
+        help="Keys timed to calibrate the backend (raised to --verify-batch if smaller)",
+    )
+    parser.add_argument(
+        "--neighborhood-radius",
+        type=int,
+        default=0,
+        help=(
+            "Also try every entry shifted by up to +-radius (0 disables the neighborhood search); "
+            "memory for deduplication grows with it, see --dedupe-limit and --neighborhood-seen-limit"
+        ),
+    )
+    parser.add_argument(
+        "--neighborhood-changes", type=int, default=1, help="Maximum entries perturbed at once"
+    )
+    parser.add_argument(
+        "--neighborhood-space",
+        choices=NEIGHBORHOOD_SPACES,
+        default="values",
+        help="Perturb the 64 area values (after pre-tick) or the 32 pair sums (after post-tick)",
+    )
+    parser.add_argument(
+        "--neighborhood-batch", type=int, default=4096, help="Perturbations expanded per vectorized batch"
+    )
+    parser.add_argument(
+        "--neighborhood-seen-limit",
+        type=int,
+        default=1_000_000,
+        help=(
+            "Pair-sum vectors remembered across the tick modes of an (area, pairing) to prune repeats "
+            "(~90 bytes each); the least recently used pairings are forgotten first"
+        ),
+    )
     args = parser.parse_args()
 
+    neighborhood = None
+    if args.neighborhood_radius > 0:
+        if args.transform_limit:
+            raise ValueError("--transform-limit cannot be combined with --neighborhood-radius")
+        neighborhood = NeighborhoodSearch(
+            space=args.neighborhood_space,
+            radius=args.neighborhood_radius,
+            max_changes=args.neighborhood_changes,
+            batch_size=args.neighborhood_batch,
+            dedupe=not args.no_dedupe,
+            max_seen_vectors=args.neighborhood_seen_limit,
+        )
+        print(f"Neighborhood: {neighborhood.size()} perturbations per combination")
+
+    backend = get_backend(args.backend)
+    if args.cross_check is None:
+        args.cross_check = 0 if backend.name == REFERENCE_BACKEND else DEFAULT_CROSS_CHECK
+    print(f"Verifier backend: {backend.name} (cross-check {args.cross_check} keys per call)")
+
     image_path = args.image
     rectangles = load_rectangles(image_path)
     area_sources = compute_area_sources(rectangles)
@@ -102,44 +405,95 @@ def main() -> None:
         raise ValueError("Start index must be less than end index")
 
     combos_slice = combinations[start:end]
+
+    if args.plan:
+        worker_items = parse_list_argument(args.plan_workers)
+        worker_counts = [int(item) for item in worker_items] if worker_items else sorted(
+            {1, 2, 4, 8, os.cpu_count() or 1}
+        )
+        plan = plan_search(
+            combos_slice,
+            start,
+            area_sources,
+            pairings_all,
+            args.transform_limit,
+            neighborhood,
+            not args.no_dedupe,
+            backend,
+            max(args.plan_calibration, args.verify_batch),
+            args.verify_batch,
+            args.cross_check,
+            worker_counts,
+            args.plan_shards,
+            args.plan_check,
+        )
+        plan["combinations_total"] = len(combinations)
+        if args.output:
+            maybe_append_jsonl(Path(args.output), {"plan": plan})
+        print(json.dumps(plan, indent=2))
+        return
+
     output_path = Path(args.output) if args.output else None
     matches_path = Path(args.matches_output) if args.matches_output else None
 
-    global_seen: set[str] = set()
+    # Insertion-ordered, so the oldest keys are the first ones forgotten at --dedupe-limit
+    global_seen: Dict[str, None] = {}
     dedupe_enabled = not args.no_dedupe
 
     total_candidates = 0
     total_transforms = 0
+    total_invalid = 0
     matches_found: List[Dict] = []
 
-    for offset, (area_name, pre_mode, pairing_name, post_mode) in enumerate(combos_slice, start=start):
-        values = area_sources[area_name]
-        pairs = pairings_all[pairing_name]
-
-        adjusted_values = apply_tick_adjustments(values, pre_mode)
-        pair_sums = combine_pairs(adjusted_values, pairs)
-        post_pair_sums = apply_pair_tick_adjustments(pair_sums, pairs, post_mode)
+    # Keys are verified in batches spanning combinations; summaries wait for their keys' batch
+    pending_keys: List[bytes] = []
+    pending_sources: List[Dict] = []
+    pending_summaries: List[Dict] = []
+
+    def flush() -> None:
+        nonlocal total_invalid
+        if pending_keys:
+            batch_matches, invalid = verify_pending(backend, pending_keys, pending_sources, args.cross_check)
+            total_invalid += invalid
+        else:
+            batch_matches = []
+
+        for match_entry in batch_matches:
+            matches_found.append(match_entry)
+            maybe_append_jsonl(matches_path, match_entry)
+
+        for summary in pending_summaries:
+            summary["matches"] = sum(1 for m in batch_matches if m["combo_index"] == summary["combo_index"])
+            maybe_append_jsonl(output_path, summary)
+            print(
+                f"[{summary['combo_index']}] area={summary['area']} pre={summary['pre_tick']} "
+                f"pair={summary['pairing']} post={summary['post_tick']} "
+                f"transforms={summary['transforms_processed']} candidates={summary['candidates_processed']} "
+                f"matches={summary['matches']}"
+            )
+
+        pending_keys.clear()
+        pending_sources.clear()
+        pending_summaries.clear()
+
+    for offset, combination in enumerate(combos_slice, start=start):
+        area_name, pre_mode, pairing_name, post_mode = combination
+        transforms_processed, candidates = combination_candidates(
+            area_sources, pairings_all, combination, args.transform_limit, neighborhood
+        )
 
-        transforms_processed = 0
         candidates_processed = 0
         unique_keys: set[str] = set()
-        combination_matches: List[Dict] = []
-
-        for transform_name, byte_values in transform_bytes(post_pair_sums):
-            transforms_processed += 1
-            if args.transform_limit and transforms_processed > args.transform_limit:
-                break
-
-            if len(byte_values) != 32 or not contains_byte77(byte_values):
-                continue
 
-            priv_bytes = bytes(byte_values)
+        for transform_name, priv_bytes, perturbation in candidates:
             hex_key = priv_bytes.hex()
 
             if dedupe_enabled:
                 if hex_key in global_seen:
                     continue
-                global_seen.add(hex_key)
+                if len(global_seen) >= args.dedupe_limit:
+                    forget_oldest(global_seen, args.dedupe_limit // DEDUPE_EVICT_DIVISOR)
+                global_seen[hex_key] = None
 
             if hex_key in unique_keys:
                 continue
@@ -147,27 +501,22 @@ def main() -> None:
             candidates_processed += 1
             total_candidates += 1
 
-            for compressed in (True, False):
-                address = privkey_to_address(priv_bytes, compressed)
-                if address == TARGET_ADDRESS:
-                    match_entry = {
-                        "combo_index": offset,
-                        "area": area_name,
-                        "pre_tick": pre_mode,
-                        "post_tick": post_mode,
-                        "pairing": pairing_name,
-                        "transform": transform_name,
-                        "format": "compressed" if compressed else "uncompressed",
-                        "hex_key": hex_key,
-                        "address": address,
-                    }
-                    combination_matches.append(match_entry)
-                    matches_found.append(match_entry)
-                    maybe_append_jsonl(matches_path, match_entry)
+            source = {
+                "combo_index": offset,
+                "area": area_name,
+                "pre_tick": pre_mode,
+                "post_tick": post_mode,
+                "pairing": pairing_name,
+                "transform": transform_name,
+            }
+            if neighborhood is not None:
+                source["perturbation"] = perturbation
+            pending_keys.append(priv_bytes)
+            pending_sources.append(source)
 
         total_transforms += transforms_processed
 
-        summary = {
+        pending_summaries.append({
             "combo_index": offset,
             "area": area_name,
             "pre_tick": pre_mode,
@@ -176,14 +525,13 @@ def main() -> None:
             "transforms_processed": transforms_processed,
             "candidates_processed": candidates_processed,
             "unique_keys": len(unique_keys),
-            "matches": len(combination_matches),
-        }
-        maybe_append_jsonl(output_path, summary)
+            "matches": 0,
+        })
 
-        print(
-            f"[{offset}] area={area_name} pre={pre_mode} pair={pairing_name} post={post_mode} "
-            f"transforms={transforms_processed} candidates={candidates_processed} matches={len(combination_matches)}"
-        )
+        if len(pending_keys) >= args.verify_batch:
+            flush()
+
+    flush()
 
     final_summary = {
         "combinations_total": len(combinations),
@@ -192,8 +540,18 @@ def main() -> None:
         "end_index": end,
         "total_transforms": total_transforms,
         "total_candidates": total_candidates,
+        "invalid_keys": total_invalid,
         "matches_found": len(matches_found),
+        "backend": backend.name,
     }
+    if neighborhood is not None:
+        final_summary["neighborhood"] = {
+            "space": neighborhood.space,
+            "radius": neighborhood.radius,
+            "max_changes": neighborhood.max_changes,
+            "perturbations": neighborhood.perturbations,
+            "distinct_vectors": neighborhood.distinct_vectors,
+        }
 
     if output_path:
         maybe_append_jsonl(output_path, {"summary": final_summary})
@@ -0,0 +1,158 @@
+import hashlib
+import itertools
+from dataclasses import dataclass, field
+from math import comb
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from solve_level5 import (
+    AFFINE_MULTIPLIERS,
+    AFFINE_OFFSETS,
+    apply_pair_tick_adjustments,
+    combine_pairs,
+    contains_byte77,
+    transform_bytes,
+)
+
+NEIGHBORHOOD_SPACES: Tuple[str, ...] = ("values", "pairs")
+
+
+def perturbation_batches(size: int, radius: int, max_changes: int, batch_size: int) -> Iterator[np.ndarray]:
+    yield np.zeros((1, size), dtype=np.int64)
+    steps = [delta for delta in range(-radius, radius + 1) if delta != 0]
+    if not steps:
+        return
+
+    for changes in range(1, min(max_changes, size) + 1):
+        deltas = np.array(list(itertools.product(steps, repeat=changes)), dtype=np.int64)
+        positions_iter = itertools.combinations(range(size), changes)
+        positions_per_batch = max(1, batch_size // len(deltas))
+        while True:
+            positions = np.array(list(itertools.islice(positions_iter, positions_per_batch)), dtype=np.intp)
+            if positions.size == 0:
+                break
+            rows = len(positions) * len(deltas)
+            offsets = np.zeros((rows, size), dtype=np.int64)
+            offsets[np.arange(rows)[:, None], np.repeat(positions, len(deltas), axis=0)] = np.tile(
+                deltas, (len(positions), 1)
+            )
+            yield offsets
+
+
+def describe_perturbation(offsets: np.ndarray, space: str) -> str:
+    return ",".join(f"{space}[{idx}]{int(offsets[idx]):+d}" for idx in np.flatnonzero(offsets))
+
+
+def affine_candidates(vectors: np.ndarray) -> Iterator[Tuple[str, bytes, int]]:
+    # Multipliers are odd, so a row hits 0x77 under (a, b) iff it holds the residue a^-1 * (0x77 - b)
+    residues = vectors.astype(np.int64) % 256
+    present = np.zeros((len(vectors), 256), dtype=bool)
+    present[np.arange(len(vectors))[:, None], residues] = True
+
+    for a in AFFINE_MULTIPLIERS:
+        a_inverse = pow(a, -1, 256)
+        for b in AFFINE_OFFSETS:
+            hits = np.flatnonzero(present[:, (a_inverse * (0x77 - b)) % 256])
+            if not hits.size:
+                continue
+            keys = ((a * residues[hits] + b) % 256).astype(np.uint8)
+            for row_idx, key in zip(hits, keys):
+                yield f"affine_{a}_{b}", key.tobytes(), int(row_idx)
+
+
+@dataclass
+class NeighborhoodSearch:
+    space: str
+    radius: int
+    max_changes: int = 1
+    batch_size: int = 4096
+    dedupe: bool = True
+    perturbations: int = 0
+    distinct_vectors: int = 0
+    max_seen_vectors: int = 1_000_000
+    # blake2b digests of expanded pair-sum vectors per (area, pairing), least recently used first
+    seen_vectors: Dict[Tuple[str, str], set] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if self.space not in NEIGHBORHOOD_SPACES:
+            raise ValueError(f"Unsupported neighborhood space: {self.space}")
+
+    def size(self) -> int:
+        entries = 64 if self.space == "values" else 32
+        return sum(comb(entries, j) * (2 * self.radius) ** j for j in range(min(self.max_changes, entries) + 1))
+
+    def _pair_sum_vectors(
+        self, offsets: np.ndarray, adjusted_values: np.ndarray, pairs: Sequence[Tuple[int, int]], post_mode: str,
+    ) -> np.ndarray:
+        if self.space == "pairs":
+            base = apply_pair_tick_adjustments(combine_pairs(adjusted_values, pairs), pairs, post_mode)
+            return base[None, :] + offsets
+        first = np.array([a for a, _ in pairs], dtype=np.intp)
+        second = np.array([b for _, b in pairs], dtype=np.intp)
+        perturbed = adjusted_values[None, :] + offsets
+        sums = perturbed[:, first] + perturbed[:, second]
+        # apply_pair_tick_adjustments indexes pairs on the first axis, so run it on the transpose
+        return np.asarray(apply_pair_tick_adjustments(sums.T, pairs, post_mode)).T
+
+    def _scope_vectors(self, scope: Tuple[str, str]) -> set:
+        # Vectors only repeat across the tick modes of one (area, pairing); forget the oldest scopes past the cap
+        scope_seen = self.seen_vectors.pop(scope, set())
+        held = len(scope_seen) + sum(map(len, self.seen_vectors.values()))
+        while self.seen_vectors and held > self.max_seen_vectors:
+            held -= len(self.seen_vectors.pop(next(iter(self.seen_vectors))))
+        self.seen_vectors[scope] = scope_seen
+        return scope_seen
+
+    def _new_vectors(self, vectors: np.ndarray, seen: set) -> List[int]:
+        fresh: List[int] = []
+        for row_idx, row in enumerate(vectors):
+            digest = hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            fresh.append(row_idx)
+        return fresh
+
+    def candidates(
+        self,
+        adjusted_values: np.ndarray,
+        pairs: Sequence[Tuple[int, int]],
+        post_mode: str,
+        scope: Tuple[str, str],
+    ) -> Tuple[int, List[Tuple[str, bytes, str]]]:
+        adjusted_values = np.asarray(adjusted_values, dtype=float)
+        transforms_processed = 0
+        found: List[Tuple[str, bytes, str]] = []
+        local_keys: set[bytes] = set()
+        seen_vectors = self._scope_vectors(scope) if self.dedupe else set()
+        entries = 64 if self.space == "values" else 32
+
+        for offsets in perturbation_batches(entries, self.radius, self.max_changes, self.batch_size):
+            self.perturbations += len(offsets)
+            vectors = self._pair_sum_vectors(offsets, adjusted_values, pairs, post_mode)
+            vectors, first_rows = np.unique(vectors, axis=0, return_index=True)
+            fresh = self._new_vectors(vectors, seen_vectors)
+            if not fresh:
+                continue
+            vectors = vectors[fresh]
+            origins = offsets[first_rows[fresh]]
+            self.distinct_vectors += len(vectors)
+
+            batch: List[Iterable[Tuple[str, bytes, int]]] = [affine_candidates(vectors)]
+            transforms_processed += len(vectors) * len(AFFINE_MULTIPLIERS) * len(AFFINE_OFFSETS)
+            for row_idx, row in enumerate(vectors):
+                row_candidates: List[Tuple[str, bytes, int]] = []
+                for transform_name, byte_values in transform_bytes(row, include_affine=False):
+                    transforms_processed += 1
+                    if len(byte_values) == 32 and contains_byte77(byte_values):
+                        row_candidates.append((transform_name, bytes(byte_values), row_idx))
+                batch.append(row_candidates)
+
+            for transform_name, priv_bytes, row_idx in itertools.chain.from_iterable(batch):
+                if priv_bytes in local_keys:
+                    continue
+                local_keys.add(priv_bytes)
+                found.append((transform_name, priv_bytes, describe_perturbation(origins[row_idx], self.space)))
+
+        return transforms_processed, found
@@ -0,0 +1,110 @@
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from verifiers import VerifierBackend, cross_check
+
+CALIBRATION_WARMUP_KEYS = 16
+
+# Transforms whose names carry parameters (affine_<a>_<b>, xor_<mask>) are grouped by prefix
+PARAMETERISED_TRANSFORMS: Tuple[str, ...] = ("affine", "xor")
+
+
+def transform_family(transform_name: str) -> str:
+    prefix = transform_name.split("_", 1)[0]
+    return prefix if prefix in PARAMETERISED_TRANSFORMS else transform_name
+
+
+def calibrate_backend(
+    backend: VerifierBackend,
+    priv_keys: Sequence[bytes],
+    verify_batch: int,
+    cross_check_sample: int,
+) -> Dict:
+    calibration = {"backend": backend.name, "verify_batch": verify_batch, "cross_check": cross_check_sample}
+    if not priv_keys:
+        return {**calibration, "keys": 0, "seconds": 0.0, "keys_per_sec": None}
+    # Keep one-time setup (imports, batch_ec.generator_table) out of the timed calls
+    backend.hash160s(priv_keys[:CALIBRATION_WARMUP_KEYS])
+    started = time.perf_counter()
+    # Same call pattern as a run: verify_batch keys per call, each paying its reference cross-check
+    for batch_start in range(0, len(priv_keys), verify_batch):
+        batch = priv_keys[batch_start:batch_start + verify_batch]
+        cross_check(backend, batch, backend.hash160s(batch), cross_check_sample)
+    seconds = time.perf_counter() - started
+    return {
+        **calibration,
+        "keys": len(priv_keys),
+        "seconds": round(seconds, 4),
+        "keys_per_sec": round(len(priv_keys) / seconds, 1),
+    }
+
+
+def estimate_wall_times(
+    shard_keys_by_workers: Dict[int, int],
+    keys_per_sec: float | None,
+    enumeration_seconds: float,
+) -> List[Dict]:
+    estimates: List[Dict] = []
+    for workers, shard_keys in shard_keys_by_workers.items():
+        verify_seconds = shard_keys / keys_per_sec if keys_per_sec else 0.0
+        seconds = enumeration_seconds / workers + verify_seconds
+        estimates.append({
+            "workers": workers,
+            "largest_shard_keys": shard_keys,
+            "seconds": round(seconds, 1),
+            "hours": round(seconds / 3600, 3),
+        })
+    return estimates
+
+
+def _greedy_shards(
+    combo_keys: Sequence[Tuple[int, Sequence[bytes]]],
+    cap: int,
+    dedupe: bool,
+) -> List[Dict]:
+    shards: List[Dict] = []
+    shard_start = 0
+    seen: set[bytes] = set()
+    cost = 0
+    for position, (_, keys) in enumerate(combo_keys):
+        added = len(set(keys) - seen) if dedupe else len(set(keys))
+        if cost + added > cap and position > shard_start:
+            shards.append({
+                "start_index": combo_keys[shard_start][0],
+                "end_index": combo_keys[position][0],
+                "unique_keys": cost,
+            })
+            shard_start = position
+            seen = set()
+            cost = 0
+            added = len(set(keys))
+        if dedupe:
+            seen.update(keys)
+        cost += added
+
+    shards.append({
+        "start_index": combo_keys[shard_start][0],
+        "end_index": combo_keys[-1][0] + 1,
+        "unique_keys": cost,
+    })
+    return shards
+
+
+def balanced_shards(
+    combo_keys: Sequence[Tuple[int, Sequence[bytes]]],
+    shard_count: int,
+    dedupe: bool,
+) -> List[Dict]:
+    if not combo_keys or shard_count <= 0:
+        return []
+
+    # A shard deduplicates only against itself; binary-search the smallest cap that fits shard_count
+    low = max(len(set(keys)) for _, keys in combo_keys)
+    high = sum(len(set(keys)) for _, keys in combo_keys)
+    while low < high:
+        cap = (low + high) // 2
+        if len(_greedy_shards(combo_keys, cap, dedupe)) <= shard_count:
+            high = cap
+        else:
+            low = cap + 1
+    return _greedy_shards(combo_keys, low, dedupe)
@@ -14,6 +14,11 @@ DEFAULT_POST_TICK_MODES: List[str] = ["none", "add", "subtract", "multiply"]
 MINI_HINT_PATTERN: Tuple[int, ...] = (0x09, 0x11, 0x18, 0x19, 0x77, 0x0C, 0x0D, 0x0A)
 HINT_SBOX_32: Tuple[int, ...] = (MINI_HINT_PATTERN * 4)[:32]
 GRAY32: Tuple[int, ...] = tuple(i ^ (i >> 1) for i in range(32))
+AFFINE_MULTIPLIERS: Tuple[int, ...] = (
+    1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 29, 31, 47, 63, 79, 95, 111, 127, 159, 191, 223, 255,
+)
+AFFINE_OFFSETS: Tuple[int, ...] = tuple(range(0, 256, 8)) + (77, 119, 155, 203)
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
 
 
 @dataclass
@@ -337,7 +342,7 @@ def combine_pairs(values: np.ndarray, pairs: Iterable[Tuple[int, int]]) -> np.nd
     return np.array([values[a] + values[b] for a, b in pairs], dtype=float)
 
 
-def transform_bytes(raw: np.ndarray) -> Iterable[Tuple[str, List[int]]]:
+def transform_bytes(raw: np.ndarray, include_affine: bool = True) -> Iterable[Tuple[str, List[int]]]:
     def normalize_values(values: np.ndarray) -> np.ndarray | None:
         if not np.all(np.isfinite(values)):
             values = np.where(np.isfinite(values), values, 0.0)
@@ -437,11 +442,10 @@ def transform_bytes(raw: np.ndarray) -> Iterable[Tuple[str, List[int]]]:
         yield "cdf_scaled", [0]
 
     # Expanded affine transforms modulo 256
-    affine_a = [1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 29, 31, 47, 63, 79, 95, 111, 127, 159, 191, 223, 255]
-    affine_b = list(range(0, 256, 8)) + [77, 119, 155, 203]
-    for a, b in itertools.product(affine_a, affine_b):
-        transformed = (a * raw_int + b) % 256
-        yield f"affine_{a}_{b}", transformed.astype(int).tolist()
+    if include_affine:
+        for a, b in itertools.product(AFFINE_MULTIPLIERS, AFFINE_OFFSETS):
+            transformed = (a * raw_int + b) % 256
+            yield f"affine_{a}_{b}", transformed.astype(int).tolist()
 
     xor_inputs = mod_vals
     yield "xor_55", [(val ^ 0x55) for val in xor_inputs]
@@ -469,18 +473,23 @@ def privkey_to_address(priv_bytes: bytes, compressed: bool) -> str:
     else:
         pubkey = b"\x04" + vk.to_string()
 
-    sha = hashlib.sha256(pubkey).digest()
-    ripe = hashlib.new("ripemd160", sha).digest()
+    return hash160_to_address(hash160(pubkey))
+
+
+def hash160(pubkey: bytes) -> bytes:
+    return hashlib.new("ripemd160", hashlib.sha256(pubkey).digest()).digest()
+
+
+def hash160_to_address(ripe: bytes) -> str:
     payload = b"\x00" + ripe
     checksum = hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
     address_bytes = payload + checksum
-    alphabet = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
 
     value = int.from_bytes(address_bytes, "big")
     encoded = ""
     while value > 0:
         value, rem = divmod(value, 58)
-        encoded = alphabet[rem] + encoded
+        encoded = BASE58_ALPHABET[rem] + encoded
 
     # handle leading zeros
     padding = 0
@@ -492,6 +501,18 @@ def privkey_to_address(priv_bytes: bytes, compressed: bool) -> str:
     return "1" * padding + encoded
 
 
+def address_to_hash160(address: str) -> bytes:
+    value = 0
+    for char in address:
+        value = value * 58 + BASE58_ALPHABET.index(char)
+    padding = len(address) - len(address.lstrip("1"))
+    address_bytes = b"\x00" * padding + value.to_bytes((value.bit_length() + 7) // 8, "big")
+    payload, checksum = address_bytes[:-4], address_bytes[-4:]
+    if len(payload) != 21 or hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        raise ValueError(f"Invalid P2PKH address: {address}")
+    return payload[1:]
+
+
 def contains_byte77(values: List[int]) -> bool:
     return any(v == 0x77 for v in values)
 
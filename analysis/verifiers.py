@@ -0,0 +1,229 @@
+import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Sequence, Tuple
+
+from ecdsa import SECP256k1, SigningKey
+
+from solve_level5 import hash160
+
+CURVE_ORDER = SECP256k1.order
+# Fastest first; fastecdsa and bitcoinlib measure slower than the always-installed ecdsa reference
+AUTO_ORDER: Tuple[str, ...] = ("coincurve", "numpy", "ecdsa")
+REFERENCE_BACKEND = "ecdsa"
+SELF_CHECK_KEYS = 64
+
+# (compressed hash160, uncompressed hash160) per key, or None when the scalar is not in [1, n)
+KeyHashes = Tuple[bytes, bytes] | None
+
+
+def is_valid_scalar(priv_bytes: bytes) -> bool:
+    return 0 < int.from_bytes(priv_bytes, "big") < CURVE_ORDER
+
+
+class VerifierBackend(ABC):
+    name = ""
+
+    def is_available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def hash160s(self, priv_keys: Sequence[bytes]) -> List[KeyHashes]:
+        ...
+
+
+class EcdsaBackend(VerifierBackend):
+    name = "ecdsa"
+
+    def hash160s(self, priv_keys: Sequence[bytes]) -> List[KeyHashes]:
+        results: List[KeyHashes] = []
+        for priv_bytes in priv_keys:
+            if not is_valid_scalar(priv_bytes):
+                results.append(None)
+                continue
+            point = SigningKey.from_string(priv_bytes, curve=SECP256k1).verifying_key.to_string()
+            prefix = b"\x02" if point[-1] % 2 == 0 else b"\x03"
+            results.append((hash160(prefix + point[:32]), hash160(b"\x04" + point)))
+        return results
+
+
+class CoincurveBackend(VerifierBackend):
+    name = "coincurve"
+
+    def is_available(self) -> bool:
+        try:
+            import coincurve  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def hash160s(self, priv_keys: Sequence[bytes]) -> List[KeyHashes]:
+        from coincurve import PublicKey
+
+        results: List[KeyHashes] = []
+        for priv_bytes in priv_keys:
+            if not is_valid_scalar(priv_bytes):
+                results.append(None)
+                continue
+            pubkey = PublicKey.from_secret(priv_bytes)
+            results.append((hash160(pubkey.format(True)), hash160(pubkey.format(False))))
+        return results
+
+
+class BitcoinlibBackend(VerifierBackend):
+    name = "bitcoinlib"
+
+    def is_available(self) -> bool:
+        try:
+            import bitcoinlib.keys  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def hash160s(self, priv_keys: Sequence[bytes]) -> List[KeyHashes]:
+        from bitcoinlib.keys import Key
+
+        results: List[KeyHashes] = []
+        for priv_bytes in priv_keys:
+            if not is_valid_scalar(priv_bytes):
+                results.append(None)
+                continue
+            key = Key(import_key=priv_bytes.hex())
+            results.append((
+                hash160(key.public_compressed_byte),
+                hash160(key.public_uncompressed_byte),
+            ))
+        return results
+
+
+class FastecdsaBackend(VerifierBackend):
+    name = "fastecdsa"
+
+    def is_available(self) -> bool:
+        try:
+            import fastecdsa.curve  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def hash160s(self, priv_keys: Sequence[bytes]) -> List[KeyHashes]:
+        from fastecdsa.curve import secp256k1
+
+        results: List[KeyHashes] = []
+        for priv_bytes in priv_keys:
+            if not is_valid_scalar(priv_bytes):
+                results.append(None)
+                continue
+            point = int.from_bytes(priv_bytes, "big") * secp256k1.G
+            x_bytes = point.x.to_bytes(32, "big")
+            prefix = b"\x02" if point.y % 2 == 0 else b"\x03"
+            results.append((hash160(prefix + x_bytes), hash160(b"\x04" + x_bytes + point.y.to_bytes(32, "big"))))
+        return results
+
+
+class NumpyBackend(VerifierBackend):
+    name = "numpy"
+
+    def hash160s(self, priv_keys: Sequence[bytes]) -> List[KeyHashes]:
+        from batch_ec import keys_to_matrix, public_points_batch, serialize_pubkeys
+
+        if not priv_keys:
+            return []
+        xs, ys, valid = public_points_batch(keys_to_matrix(priv_keys))
+        compressed = serialize_pubkeys(xs, ys, compressed=True)
+        uncompressed = serialize_pubkeys(xs, ys, compressed=False)
+        return [
+            (hash160(compressed[i].tobytes()), hash160(uncompressed[i].tobytes()))
+            if valid[i] else None
+            for i in range(len(priv_keys))
+        ]
+
+
+BACKENDS: Dict[str, VerifierBackend] = {
+    backend.name: backend
+    for backend in (EcdsaBackend(), CoincurveBackend(), BitcoinlibBackend(), FastecdsaBackend(), NumpyBackend())
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def self_check(backend: VerifierBackend, sample_size: int = SELF_CHECK_KEYS) -> List[str]:
+    from batch_ec import edge_case_keys
+
+    rng = random.Random(0)
+    priv_keys = edge_case_keys() + [rng.randrange(1, CURVE_ORDER).to_bytes(32, "big") for _ in range(sample_size)]
+    return cross_check(backend, priv_keys, backend.hash160s(priv_keys), len(priv_keys), rng)
+
+
+def get_backend(name: str = "auto") -> VerifierBackend:
+    if name == "auto":
+        for candidate in AUTO_ORDER:
+            backend = BACKENDS[candidate]
+            if not backend.is_available():
+                continue
+            mismatches = [] if candidate == REFERENCE_BACKEND else self_check(backend)
+            if mismatches:
+                print(
+                    f"Skipping verifier backend {candidate}: self-check failed for {len(mismatches)} keys "
+                    f"(first {mismatches[0]})",
+                    file=sys.stderr,
+                )
+                continue
+            return backend
+        raise RuntimeError("No verifier backend available")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown verifier backend: {name} (choose from auto, {', '.join(BACKENDS)})")
+    backend = BACKENDS[name]
+    if not backend.is_available():
+        raise RuntimeError(f"Verifier backend {name} is not installed")
+    return backend
+
+
+def cross_check(
+    backend: VerifierBackend,
+    priv_keys: Sequence[bytes],
+    results: Sequence[KeyHashes],
+    sample_size: int,
+    rng: random.Random | None = None,
+) -> List[str]:
+    if backend.name == REFERENCE_BACKEND or sample_size <= 0 or not priv_keys:
+        return []
+    rng = rng or random.Random()
+    indices = rng.sample(range(len(priv_keys)), min(sample_size, len(priv_keys)))
+    reference = BACKENDS[REFERENCE_BACKEND].hash160s([priv_keys[i] for i in indices])
+    return [priv_keys[i].hex() for i, expected in zip(indices, reference) if results[i] != expected]
+
+
+def main() -> None:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Cross-check and benchmark every installed verifier backend")
+    parser.add_argument("--keys", type=int, default=4096, help="Random keys per backend")
+    parser.add_argument("--sample", type=int, default=256, help="Keys per backend recomputed with the reference")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    priv_keys = [rng.randrange(1, CURVE_ORDER).to_bytes(32, "big") for _ in range(args.keys)]
+    priv_keys += [b"\x00" * 32, CURVE_ORDER.to_bytes(32, "big"), b"\x00" * 31 + b"\x01"]
+
+    report: Dict[str, object] = {"auto": get_backend("auto").name}
+    for name in available_backends():
+        backend = BACKENDS[name]
+        started = time.perf_counter()
+        results = backend.hash160s(priv_keys)
+        seconds = time.perf_counter() - started
+        mismatches = cross_check(backend, priv_keys, results, args.sample, rng)
+        mismatches += cross_check(backend, priv_keys[-3:], results[-3:], 3, rng)
+        report[name] = {
+            "keys_per_sec": round(len(priv_keys) / seconds, 1),
+            "mismatches": mismatches,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()